@@ -1,8 +1,10 @@
+from __future__ import annotations
+
 from datetime import datetime
 from typing import List, Tuple, Dict, Any
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True)
 class SensorData:
     id: str
     name: str
@@ -12,7 +14,7 @@ class SensorData:
     last_updated: datetime
     status: str
 
-@dataclass
+@dataclass(slots=True)
 class CropData:
     crop_type: str
     planted_date: datetime
@@ -22,7 +24,7 @@ class CropData:
     growth_stage: str
     health_status: str = 'None'
 
-@dataclass
+@dataclass(slots=True)
 class SystemAlert:
     id: str
     type: str
@@ -30,10 +32,19 @@ class SystemAlert:
     timestamp: datetime
     resolved: bool
 
-@dataclass
+@dataclass(slots=True)
 class WeatherData:
     temperature: float
     humidity: float
     pressure: float
     wind_speed: float
-    forecast: str
\ No newline at end of file
+    forecast: str
+
+@dataclass(slots=True)
+class SystemSnapshot:
+    timestamp: datetime
+    sensor_data: Tuple[SensorData, ...]
+    crop_data: Tuple[CropData, ...]
+    alerts: Tuple[SystemAlert, ...]
+    irrigation_status: bool
+    system_status: str
\ No newline at end of file
@@ -4,9 +4,85 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Optional
 from agriculture_types import SensorData, CropData
-import random
+from functools import lru_cache
+import json
+
+STAGE_FACTORS = {
+    'Seedling': 0.3,
+    'Vegetative': 0.6,
+    'Flowering': 0.9,
+    'Fruiting': 1.0,
+    'Maturation': 1.0,
+    'Harvest': 1.0
+}
+DEFAULT_STAGE_FACTOR = 0.8
+DEFAULT_CROP_COEFFICIENTS = {'base_yield': 4000.0, 'temp_sensitivity': 1.0, 'water_need': 1.0}
+# model_weights key -> training feature whose importance it reports
+WEIGHT_FEATURES = {
+    'soil_moisture': 'soil_moisture_%',
+    'soil_pH': 'soil_pH',
+    'temperature': 'temperature_C',
+    'rainfall': 'rainfall_mm',
+    'humidity': 'humidity_%',
+    'sunlight_hours': 'sunlight_hours',
+    'NDVI_index': 'NDVI_index'
+}
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # numba is optional; the kernel then runs as plain Python over float lists
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+@njit(cache=True, fastmath=True)
+def _heuristic_yield_kernel(values, present, opt_mins, opt_maxs, weights, temp_idx: int, moist_idx: int,
+                            temp_sens: float, water_need: float, health_factor: float,
+                            stage_factor: float, base_yield: float) -> float:
+    """Weighted environmental score scaled to a yield, for the untrained fallback."""
+    environmental_score = 0.0
+    for i in range(len(values)):
+        if present[i]:
+            value = values[i]
+            if value < opt_mins[i]:
+                normalized = max(0.0, value / opt_mins[i])
+            elif value > opt_maxs[i]:
+                normalized = max(0.0, opt_maxs[i] / value)
+            else:
+                normalized = 1.0
+            environmental_score += normalized * weights[i]
+    if present[temp_idx]:
+        optimal_temp = (opt_mins[temp_idx] + opt_maxs[temp_idx]) / 2
+        temp_deviation = abs(values[temp_idx] - optimal_temp) / optimal_temp
+        environmental_score *= max(0.1, 1.0 - temp_deviation * temp_sens * 0.5)
+    if present[moist_idx]:
+        moisture = values[moist_idx]
+        if moisture < opt_mins[moist_idx]:
+            water_factor = (moisture / opt_mins[moist_idx]) * water_need
+        elif moisture > opt_maxs[moist_idx]:
+            water_factor = 1.0 - ((moisture - opt_maxs[moist_idx]) / opt_maxs[moist_idx]) * 0.3
+        else:
+            water_factor = 1.0
+        environmental_score *= max(0.1, water_factor)
+    return base_yield * environmental_score * health_factor * stage_factor
+
+# Sensor values are rounded to two decimals, so the same (value, range)
+# arguments recur and are served from the cache.
+@lru_cache(maxsize=4096)
+def normalize_sensor_value(value: float, optimal_range: Tuple[float, float]) -> float:
+    min_optimal, max_optimal = optimal_range
+    if min_optimal <= value <= max_optimal:
+        return 1.0
+    elif value < min_optimal:
+        return max(0.0, value / min_optimal)
+    else:
+        return max(0.0, max_optimal / value)
 
 class CropYieldPredictor:
     def __init__(self):
@@ -26,7 +102,10 @@ class CropYieldPredictor:
             'Cotton': {'base_yield': 3500.0, 'temp_sensitivity': 1.1, 'water_need': 1.3},
             'Rice': {'base_yield': 4500.0, 'temp_sensitivity': 1.2, 'water_need': 1.4}
         }
-        self.training_data = []
+        self.weight_index = {key: i for i, key in enumerate(self.model_weights)}
+        # model_weights as indented JSON for display, refreshed whenever training updates them
+        self.weights_json = json.dumps(self.model_weights, indent=2)
+        self.training_data: Optional[pd.DataFrame] = None
         self.model_accuracy = 0.85
         self.numerical_features = ['soil_moisture_%', 'soil_pH', 'temperature_C', 'rainfall_mm', 
                                  'humidity_%', 'sunlight_hours', 'NDVI_index']
@@ -39,9 +118,25 @@ class CropYieldPredictor:
             ])
         self.model = Pipeline([
             ('preprocessor', self.preprocessor),
-            ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
+            ('regressor', RandomForestRegressor(n_estimators=100, max_depth=12, min_samples_leaf=5,
+                                                n_jobs=-1, random_state=42))
         ])
         self.is_trained = False
+        # Random +/-10% variation on heuristic predictions, all drawn from
+        # _rng; disable for deterministic results or seed _rng to reproduce them.
+        self.enable_noise = True
+        self._rng = np.random.default_rng()
+        # Fitted pipeline steps, cached after training so predictions can skip
+        # pandas and the ColumnTransformer entirely.
+        self._scaler_mean = None
+        self._scaler_scale = None
+        self._crop_onehot: Dict[str, np.ndarray] = {}
+        self._crop_onehot_unknown = np.empty(0)
+        self._status_onehot: Dict[str, np.ndarray] = {}
+        self._status_onehot_unknown = np.empty(0)
+        self._categorical_rows: Dict[Tuple[str, str], np.ndarray] = {}
+        self._n_model_features = 0
+        self._regressor = None
 
     def train_model(self, dataset_path: str):
         """Train the model using a CSV dataset."""
@@ -53,111 +148,147 @@ class CropYieldPredictor:
             X = df[features]
             y = df[target]
             self.model.fit(X, y)
+            self._cache_fitted_steps()
             self.is_trained = True
             self.model_accuracy = self.model.score(X, y)
-            feature_names = (self.numerical_features + 
-                           list(self.model.named_steps['preprocessor']
-                                .named_transformers_['cat']
-                                .get_feature_names_out(self.categorical_features)))
-            importances = self.model.named_steps['regressor'].feature_importances_
-            for feature, importance in zip(feature_names, importances):
-                for key in self.model_weights:
-                    if key in feature:
-                        self.model_weights[key] = importance
+            # Numerical features come first in the preprocessed matrix
+            importances = self._regressor.feature_importances_
+            feature_index = {feature: i for i, feature in enumerate(self.numerical_features)}
+            for key, feature in WEIGHT_FEATURES.items():
+                self.model_weights[key] = float(importances[feature_index[feature]])
+            self.weights_json = json.dumps(self.model_weights, indent=2)
             print(f"🤖 Model trained with {len(df)} data points")
             print(f"📊 Model accuracy (R²): {self.model_accuracy:.2%}")
-            self.training_data = df.to_dict('records')
+            self.training_data = df
         except Exception as e:
             print(f"❌ Error training model: {str(e)}")
 
+    def _cache_fitted_steps(self) -> None:
+        """Keep the fitted scaler statistics, one-hot column layout and regressor."""
+        preprocessor = self.model.named_steps['preprocessor']
+        scaler = preprocessor.named_transformers_['num']
+        encoder = preprocessor.named_transformers_['cat']
+        self._scaler_mean = scaler.mean_
+        self._scaler_scale = scaler.scale_
+        drop_indices = encoder.drop_idx_ if encoder.drop_idx_ is not None else [None] * len(encoder.categories_)
+        # One {category: dense one-hot row} table per categorical feature; dropped
+        # and unknown categories encode as all zeros.
+        tables = []
+        n_features = len(self.numerical_features)
+        for categories, drop_idx in zip(encoder.categories_, drop_indices):
+            width = len(categories) - (drop_idx is not None)
+            rows = {}
+            column = 0
+            for j, category in enumerate(categories):
+                row = np.zeros(width)
+                if j != drop_idx:
+                    row[column] = 1.0
+                    column += 1
+                rows[category] = row
+            tables.append((rows, np.zeros(width)))
+            n_features += width
+        (self._crop_onehot, self._crop_onehot_unknown), (self._status_onehot, self._status_onehot_unknown) = tables
+        self._categorical_rows = {}
+        self._n_model_features = n_features
+        self._regressor = self.model.named_steps['regressor']
+
+    def _model_inputs(self, crops: List[CropData], sensors: List[SensorData]) -> np.ndarray:
+        """Build the preprocessed feature matrix the regressor expects, one row per crop."""
+        n_numerical = len(self.numerical_features)
+        numerical = np.fromiter(self.sensor_features(sensors).values(), dtype=np.float64, count=n_numerical)
+        X = np.empty((len(crops), self._n_model_features))
+        X[:, :n_numerical] = (numerical - self._scaler_mean) / self._scaler_scale
+        for i, crop in enumerate(crops):
+            X[i, n_numerical:] = self._categorical_row(crop.crop_type, crop.health_status)
+        return X
+
+    def _categorical_row(self, crop_type: str, health_status: str) -> np.ndarray:
+        """Encoded categorical features for a (crop type, disease status) pair, memoized."""
+        key = (crop_type, health_status)
+        row = self._categorical_rows.get(key)
+        if row is None:
+            row = np.concatenate([
+                self._crop_onehot.get(crop_type, self._crop_onehot_unknown),
+                self._status_onehot.get(health_status, self._status_onehot_unknown)
+            ])
+            self._categorical_rows[key] = row
+        return row
+
+    def sensor_features(self, sensors: List[SensorData]) -> Dict[str, float]:
+        """Map current sensor readings onto the model's numerical features."""
+        sensor_dict = {sensor.id: sensor.value for sensor in sensors}
+        return {
+            'soil_moisture_%': sensor_dict.get('soil_moisture', 30.0),
+            'soil_pH': sensor_dict.get('soil_pH', 6.5),
+            'temperature_C': sensor_dict.get('temperature', 25.0),
+            'rainfall_mm': sensor_dict.get('rainfall', 150.0),
+            'humidity_%': sensor_dict.get('humidity', 60.0),
+            'sunlight_hours': sensor_dict.get('sunlight_hours', 6.0),
+            'NDVI_index': sensor_dict.get('NDVI_index', 0.5)
+        }
+
+    def _heuristic_inputs(self, sensors: List[SensorData]) -> Tuple[Any, ...]:
+        """Pack sensor readings into the sequences consumed by _heuristic_yield_kernel."""
+        n_weights = len(self.weight_index)
+        values = [0.0] * n_weights
+        present = [False] * n_weights
+        opt_mins = [1.0] * n_weights
+        opt_maxs = [1.0] * n_weights
+        for sensor in sensors:
+            idx = self.weight_index.get(sensor.id)
+            if idx is not None:
+                values[idx] = sensor.value
+                present[idx] = True
+                opt_mins[idx], opt_maxs[idx] = sensor.optimal_range
+        weights = list(self.model_weights.values())
+        # The compiled kernel wants arrays; as plain Python it indexes lists far faster
+        if NUMBA_AVAILABLE:
+            return (np.array(values), np.array(present), np.array(opt_mins),
+                    np.array(opt_maxs), np.array(weights, dtype=np.float64))
+        return values, present, opt_mins, opt_maxs, weights
+
+    def _heuristic_yield(self, crop: CropData, inputs: Tuple[Any, ...]) -> float:
+        """Heuristic yield for one crop, before any random variation."""
+        crop_coeff = self.crop_coefficients.get(crop.crop_type, DEFAULT_CROP_COEFFICIENTS)
+        return _heuristic_yield_kernel(
+            *inputs,
+            self.weight_index['temperature'], self.weight_index['soil_moisture'],
+            crop_coeff['temp_sensitivity'], crop_coeff['water_need'],
+            crop.health_score / 100.0,
+            STAGE_FACTORS.get(crop.growth_stage, DEFAULT_STAGE_FACTOR),
+            crop_coeff['base_yield']
+        )
+
+    def predict_yields(self, crops: List[CropData], sensors: List[SensorData]) -> np.ndarray:
+        """Predict yields for all crops with a single batched model call."""
+        n = len(crops)
+        if n == 0:
+            return np.empty(0)
+        if not self.is_trained:
+            inputs = self._heuristic_inputs(sensors)
+            predicted = np.array([self._heuristic_yield(crop, inputs) for crop in crops])
+            if self.enable_noise:
+                predicted *= self._rng.uniform(0.9, 1.1, size=n)
+            return np.round(np.maximum(predicted, 0.0), 2)
+        predicted = self._regressor.predict(self._model_inputs(crops, sensors))
+        health_factors = np.empty(n)
+        stage_factors = np.empty(n)
+        base_yields = np.empty(n)
+        for i, crop in enumerate(crops):
+            health_factors[i] = crop.health_score / 100.0
+            stage_factors[i] = STAGE_FACTORS.get(crop.growth_stage, DEFAULT_STAGE_FACTOR)
+            base_yields[i] = self.crop_coefficients.get(crop.crop_type, DEFAULT_CROP_COEFFICIENTS)['base_yield']
+        predicted *= health_factors * stage_factors * base_yields / 4000.0
+        return np.round(np.maximum(predicted, 0.0), 2)
+
     def predict_yield(self, crop: CropData, sensors: List[SensorData]) -> float:
         """Predict crop yield using the trained model or fallback to heuristic logic."""
         if self.is_trained:
-            sensor_dict = {sensor.id: sensor.value for sensor in sensors}
-            input_data = {
-                'soil_moisture_%': sensor_dict.get('soil_moisture', 30.0),
-                'soil_pH': sensor_dict.get('soil_pH', 6.5),
-                'temperature_C': sensor_dict.get('temperature', 25.0),
-                'rainfall_mm': sensor_dict.get('rainfall', 150.0),
-                'humidity_%': sensor_dict.get('humidity', 60.0),
-                'sunlight_hours': sensor_dict.get('sunlight_hours', 6.0),
-                'NDVI_index': sensor_dict.get('NDVI_index', 0.5),
-                'crop_type': crop.crop_type,
-                'crop_disease_status': crop.health_status if hasattr(crop, 'health_status') else 'None'
-            }
-            input_df = pd.DataFrame([input_data])
-            predicted_yield = self.model.predict(input_df)[0]
-            crop_coeff = self.crop_coefficients.get(crop.crop_type, {
-                'base_yield': 4000.0, 'temp_sensitivity': 1.0, 'water_need': 1.0
-            })
-            health_factor = crop.health_score / 100.0 if hasattr(crop, 'health_score') else 1.0
-            stage_factor = self.get_growth_stage_factor(crop.growth_stage)
-            predicted_yield *= health_factor * stage_factor * crop_coeff['base_yield'] / 4000.0
-            return round(max(0.0, predicted_yield), 2)
-        else:
-            sensor_dict = {sensor.id: sensor for sensor in sensors}
-            environmental_score = 0.0
-            for sensor_id, weight in self.model_weights.items():
-                if sensor_id in sensor_dict:
-                    sensor = sensor_dict[sensor_id]
-                    normalized_value = self.normalize_sensor_value(sensor.value, sensor.optimal_range)
-                    environmental_score += normalized_value * weight
-            crop_coeff = self.crop_coefficients.get(crop.crop_type, {
-                'base_yield': 4000.0, 'temp_sensitivity': 1.0, 'water_need': 1.0
-            })
-            if 'temperature' in sensor_dict:
-                temp_sensor = sensor_dict['temperature']
-                temp_factor = self.calculate_temperature_factor(
-                    temp_sensor.value, temp_sensor.optimal_range, crop_coeff['temp_sensitivity']
-                )
-                environmental_score *= temp_factor
-            if 'soil_moisture' in sensor_dict:
-                moisture_sensor = sensor_dict['soil_moisture']
-                water_factor = self.calculate_water_factor(
-                    moisture_sensor.value, moisture_sensor.optimal_range, crop_coeff['water_need']
-                )
-                environmental_score *= water_factor
-            health_factor = crop.health_score / 100.0 if hasattr(crop, 'health_score') else 1.0
-            stage_factor = self.get_growth_stage_factor(crop.growth_stage)
-            base_yield = crop_coeff['base_yield']
-            predicted_yield = base_yield * environmental_score * health_factor * stage_factor
-            variation = random.uniform(0.9, 1.1)
-            predicted_yield *= variation
-            return round(max(0.0, predicted_yield), 2)
-
-    def normalize_sensor_value(self, value: float, optimal_range: Tuple[float, float]) -> float:
-        min_optimal, max_optimal = optimal_range
-        if min_optimal <= value <= max_optimal:
-            return 1.0
-        elif value < min_optimal:
-            return max(0.0, value / min_optimal)
-        else:
-            return max(0.0, max_optimal / value)
-
-    def calculate_temperature_factor(self, temp: float, optimal_range: Tuple[float, float], sensitivity: float) -> float:
-        min_temp, max_temp = optimal_range
-        optimal_temp = (min_temp + max_temp) / 2
-        temp_deviation = abs(temp - optimal_temp) / optimal_temp
-        temp_factor = 1.0 - (temp_deviation * sensitivity * 0.5)
-        return max(0.1, temp_factor)
-
-    def calculate_water_factor(self, moisture: float, optimal_range: Tuple[float, float], water_need: float) -> float:
-        min_moisture, max_moisture = optimal_range
-        if moisture < min_moisture:
-            water_factor = (moisture / min_moisture) * water_need
-        elif moisture > max_moisture:
-            water_factor = 1.0 - ((moisture - max_moisture) / max_moisture) * 0.3
-        else:
-            water_factor = 1.0
-        return max(0.1, water_factor)
+            return float(self.predict_yields([crop], sensors)[0])
+        predicted = self._heuristic_yield(crop, self._heuristic_inputs(sensors))
+        if self.enable_noise:
+            predicted *= 0.9 + 0.2 * self._rng.random()  # Same draw as predict_yields, without uniform()'s overhead
+        return round(max(0.0, predicted), 2)
 
     def get_growth_stage_factor(self, growth_stage: str) -> float:
-        stage_factors = {
-            'Seedling': 0.3,
-            'Vegetative': 0.6,
-            'Flowering': 0.9,
-            'Fruiting': 1.0,
-            'Maturation': 1.0,
-            'Harvest': 1.0
-        }
-        return stage_factors.get(growth_stage, 0.8)
\ No newline at end of file
+        return STAGE_FACTORS.get(growth_stage, DEFAULT_STAGE_FACTOR)
\ No newline at end of file
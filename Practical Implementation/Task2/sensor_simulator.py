@@ -1,7 +1,7 @@
 import random
 import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 from agriculture_types import SensorData
 
 class IoTSensorSimulator:
@@ -53,6 +53,13 @@ class IoTSensorSimulator:
             }
         }
         
+        # Sensors scaled by environment: (time factor key, weather factor key)
+        self._env_apply = {
+            'soil_temperature': ('temperature_factor', 'temp'),
+            'air_humidity': ('humidity_factor', 'humidity'),
+            'light_intensity': ('light_factor', 'light')
+        }
+        
         self.sensor_states = {}
         self.initialize_sensors()
     
@@ -70,9 +77,10 @@ class IoTSensorSimulator:
                 'noise_level': random.uniform(0.01, 0.05)
             }
     
-    def simulate_environmental_factors(self) -> Dict[str, float]:
+    def simulate_environmental_factors(self, current_hour: Optional[int] = None) -> Dict[str, float]:
         """Simulate environmental factors that affect sensor readings"""
-        current_hour = datetime.now().hour
+        if current_hour is None:
+            current_hour = datetime.now().hour
         
         # Time-based factors
         time_factors = {
@@ -100,25 +108,23 @@ class IoTSensorSimulator:
         """Simulate reading from a specific sensor"""
         if sensor_id not in self.sensors_config:
             raise ValueError(f"Unknown sensor: {sensor_id}")
-        
+        now = datetime.now()
+        return self._read_sensor_with_env(sensor_id, self.simulate_environmental_factors(now.hour), now)
+    
+    def _read_sensor_with_env(self, sensor_id: str, env_factors: Dict, now: datetime) -> float:
+        """Simulate a sensor reading under already-computed environmental factors"""
         config = self.sensors_config[sensor_id]
         state = self.sensor_states[sensor_id]
-        env_factors = self.simulate_environmental_factors()
         
         # Base value with drift
         current_value = state['current_value']
         drift_rate = config['drift_rate']
         
         # Apply environmental factors
-        if sensor_id == 'soil_temperature':
-            current_value *= env_factors['time_factors']['temperature_factor']
-            current_value *= env_factors['weather_factors']['temp']
-        elif sensor_id == 'air_humidity':
-            current_value *= env_factors['time_factors']['humidity_factor']
-            current_value *= env_factors['weather_factors']['humidity']
-        elif sensor_id == 'light_intensity':
-            current_value *= env_factors['time_factors']['light_factor']
-            current_value *= env_factors['weather_factors']['light']
+        mapping = self._env_apply.get(sensor_id)
+        if mapping is not None:
+            time_key, weather_key = mapping
+            current_value *= env_factors['time_factors'][time_key] * env_factors['weather_factors'][weather_key]
         elif sensor_id == 'soil_moisture' and env_factors['weather'] == 'rainy':
             current_value *= 1.3  # Increase moisture during rain
         
@@ -136,7 +142,7 @@ class IoTSensorSimulator:
         
         # Update sensor state
         state['current_value'] = current_value
-        state['last_reading'] = datetime.now()
+        state['last_reading'] = now
         
         # Occasionally change drift direction
         if random.random() < 0.1:
@@ -146,9 +152,12 @@ class IoTSensorSimulator:
     
     def read_all_sensors(self) -> Dict[str, float]:
         """Read all sensors and return their values"""
+        # All sensors in one batch share the same timestamp and weather
+        now = datetime.now()
+        env_factors = self.simulate_environmental_factors(now.hour)
         readings = {}
         for sensor_id in self.sensors_config.keys():
-            readings[sensor_id] = self.read_sensor(sensor_id)
+            readings[sensor_id] = self._read_sensor_with_env(sensor_id, env_factors, now)
         return readings
     
     def simulate_sensor_failure(self, sensor_id: str, duration: int = 30):
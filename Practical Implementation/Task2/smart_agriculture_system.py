@@ -1,19 +1,38 @@
-import random
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List, Dict
-from agriculture_types import SensorData, CropData, SystemAlert
-from ai_models import CropYieldPredictor
+from typing import List, Dict, Tuple, Deque, Optional
+import numpy as np
+from agriculture_types import SensorData, CropData, SystemAlert, SystemSnapshot
+from ai_models import CropYieldPredictor, normalize_sensor_value
 import streamlit as st
 
+LEARNING_WINDOW = 100  # Readings kept for learning
+PATTERN_WINDOW = 10  # Most recent readings used for trend detection
+YIELD_HISTORY_SIZE = 500  # Crop yield predictions kept in the dashboard session
+ALERT_RETENTION = timedelta(hours=1)  # How long resolved and informational alerts are kept
+
 class SmartAgricultureSystem:
     def __init__(self):
         self.sensors: List[SensorData] = []
+        self.sensor_index: Dict[str, SensorData] = {}
         self.crops: List[CropData] = []
         self.alerts: List[SystemAlert] = []
-        self.learning_data: List[List[float]] = []
+        # Unresolved alerts keyed by (kind, subject id) for duplicate checks, and
+        # the key of each unresolved alert id so resolve_alert can drop it directly
+        self._unresolved_by_key: Dict[Tuple[str, str], SystemAlert] = {}
+        self._alert_keys: Dict[str, Tuple[str, str]] = {}
+        self._next_expiry: Optional[datetime] = None  # Oldest kept alert that can expire
+        self.learning_data: Deque[List[float]] = deque(maxlen=LEARNING_WINDOW)
         self.irrigation_schedule: Dict[str, bool] = {}
         self.predictor = None  # Will be set in main.py or streamlit_app.py
+        self._rng = np.random.default_rng()
+        self.yield_weights: List[Tuple[str, float]] = [
+            ('soil_moisture', 0.4),
+            ('soil_ph', 0.2),
+            ('temperature', 0.3),
+            ('sunlight_hours', 0.1)
+        ]
         self.initialize_sensors()
         self.initialize_crops()
         print("Smart Agriculture System initialized successfully!")
@@ -40,6 +59,13 @@ class SmartAgricultureSystem:
                 status='optimal'
             )
             self.sensors.append(sensor)
+        self.sensor_index = {s.id: s for s in self.sensors}
+        self._opt_mins = np.array([s.optimal_range[0] for s in self.sensors])
+        self._opt_maxs = np.array([s.optimal_range[1] for s in self.sensors])
+        self._values = np.zeros(len(self.sensors))
+        # Ring buffer mirroring learning_data for vectorized pattern analysis
+        self._learning_array = np.zeros((LEARNING_WINDOW, len(self.sensors)))
+        self._learning_head = 0
 
     def initialize_crops(self) -> None:
         now = datetime.now()
@@ -60,54 +86,43 @@ class SmartAgricultureSystem:
             )
             self.crops.append(crop)
 
-    def generate_sensor_reading(self, sensor: SensorData) -> float:
-        min_val, max_val = sensor.optimal_range
-        base_value = (min_val + max_val) / 2
-        variation = (max_val - min_val) * 0.3
-        random_factor = (random.random() - 0.5) * 2
-        new_value = base_value + variation * random_factor
-        time_factor = random.uniform(0.9, 1.1)
-        return round(new_value * time_factor, 2)
+    def generate_sensor_readings(self) -> np.ndarray:
+        n = len(self.sensors)
+        base_values = (self._opt_mins + self._opt_maxs) / 2
+        variations = (self._opt_maxs - self._opt_mins) * 0.3
+        random_factors = self._rng.uniform(-1.0, 1.0, size=n)
+        time_factors = self._rng.uniform(0.9, 1.1, size=n)
+        return np.round((base_values + variations * random_factors) * time_factors, 2)
 
-    def update_sensor_status(self, sensor: SensorData) -> None:
-        min_val, max_val = sensor.optimal_range
-        value = sensor.value
-        if value < min_val * 0.8 or value > max_val * 1.2:
-            sensor.status = 'critical'
-        elif value < min_val * 0.9 or value > max_val * 1.1:
-            sensor.status = 'warning'
-        else:
-            sensor.status = 'optimal'
+    def update_sensor_statuses(self) -> None:
+        values = self._values
+        critical = (values < self._opt_mins * 0.8) | (values > self._opt_maxs * 1.2)
+        warning = (values < self._opt_mins * 0.9) | (values > self._opt_maxs * 1.1)
+        statuses = np.select([critical, warning], ['critical', 'warning'], default='optimal')
+        for sensor, status in zip(self.sensors, statuses.tolist()):
+            sensor.status = status
 
     def learn_from_data(self, sensor_data: List[float]) -> None:
         self.learning_data.append(sensor_data.copy())
-        if len(self.learning_data) > 100:
-            self.learning_data.pop(0)
-        if len(self.learning_data) >= 10:
+        self._learning_array[self._learning_head] = sensor_data
+        self._learning_head = (self._learning_head + 1) % LEARNING_WINDOW
+        if len(self.learning_data) >= PATTERN_WINDOW:
             self.analyze_patterns()
 
     def analyze_patterns(self) -> None:
-        recent_data = self.learning_data[-10:]
-        for i, sensor in enumerate(self.sensors):
-            if i < len(recent_data[0]):
-                values = [reading[i] for reading in recent_data]
-                avg_value = sum(values) / len(values)
-                trend = "stable"
-                if len(values) > 1:
-                    if values[-1] > values[0] * 1.1:
-                        trend = "increasing"
-                    elif values[-1] < values[0] * 0.9:
-                        trend = "decreasing"
-                if trend != "stable" and sensor.status == "warning":
-                    self.create_predictive_alert(sensor, trend)
+        rows = (self._learning_head - PATTERN_WINDOW + np.arange(PATTERN_WINDOW)) % LEARNING_WINDOW
+        recent_data = self._learning_array[rows]
+        first, last = recent_data[0], recent_data[-1]
+        increasing = last > first * 1.1
+        decreasing = ~increasing & (last < first * 0.9)
+        for sensor, inc, dec in zip(self.sensors, increasing.tolist(), decreasing.tolist()):
+            if (inc or dec) and sensor.status == "warning":
+                self.create_predictive_alert(sensor, "increasing" if inc else "decreasing")
 
     def create_predictive_alert(self, sensor: SensorData, trend: str) -> None:
         alert_id = f"predictive_{sensor.id}_{int(time.time())}"
-        existing_alert = any(
-            alert.message.startswith(f"Predictive: {sensor.name}") and not alert.resolved
-            for alert in self.alerts
-        )
-        if not existing_alert:
+        key = ('predictive', sensor.id)
+        if key not in self._unresolved_by_key:
             message = f"Predictive: {sensor.name} showing {trend} trend - may need attention soon"
             alert = SystemAlert(
                 id=alert_id,
@@ -116,44 +131,34 @@ class SmartAgricultureSystem:
                 timestamp=datetime.now(),
                 resolved=False
             )
-            self.alerts.append(alert)
+            self.add_alert(key, alert)
 
     def predict_crop_yield(self, crop: CropData) -> float:
         if self.predictor and self.predictor.is_trained:
             return self.predictor.predict_yield(crop, self.sensors)
         else:
-            sensor_values = {sensor.id: sensor.value for sensor in self.sensors}
             health_factor = crop.health_score / 100.0
-            weights = {
-                'soil_moisture': 0.4,
-                'soil_ph': 0.2,
-                'temperature': 0.3,
-                'sunlight_hours': 0.1
-            }
             normalized_scores = {}
-            for sensor_id, weight in weights.items():
-                sensor = next((s for s in self.sensors if s.id == sensor_id), None)
+            for sensor_id, weight in self.yield_weights:
+                sensor = self.sensor_index.get(sensor_id)
                 if sensor:
-                    min_val, max_val = sensor.optimal_range
-                    current_val = sensor_values.get(sensor_id, min_val)
-                    if min_val <= current_val <= max_val:
-                        normalized_scores[sensor_id] = 1.0
-                    else:
-                        normalized_scores[sensor_id] = max(0, current_val / min_val if current_val < min_val else max_val / current_val)
-            yield_score = sum(normalized_scores.get(sensor_id, 0.5) * weight for sensor_id, weight in weights.items()) * health_factor
+                    normalized_scores[sensor_id] = normalize_sensor_value(sensor.value, sensor.optimal_range)
+            yield_score = sum(normalized_scores.get(sensor_id, 0.5) * weight for sensor_id, weight in self.yield_weights) * health_factor
             base_yields = {'Wheat': 4000.0, 'Soybean': 4500.0, 'Maize': 5000.0}
             base_yield = base_yields.get(crop.crop_type, 4000.0)
             return round(base_yield * yield_score, 2)
 
+    def predict_crop_yields(self) -> List[float]:
+        if self.predictor and self.predictor.is_trained:
+            return self.predictor.predict_yields(self.crops, self.sensors).tolist()
+        return [self.predict_crop_yield(crop) for crop in self.crops]
+
     def check_for_alerts(self) -> None:
         for sensor in self.sensors:
             if sensor.status == 'critical':
                 alert_id = f"critical_{sensor.id}_{int(time.time())}"
-                existing_alert = any(
-                    sensor.name in alert.message and alert.type == 'error' and not alert.resolved
-                    for alert in self.alerts
-                )
-                if not existing_alert:
+                key = ('critical', sensor.id)
+                if key not in self._unresolved_by_key:
                     alert = SystemAlert(
                         id=alert_id,
                         type='error',
@@ -161,10 +166,10 @@ class SmartAgricultureSystem:
                         timestamp=datetime.now(),
                         resolved=False
                     )
-                    self.alerts.append(alert)
+                    self.add_alert(key, alert)
 
     def auto_irrigate(self) -> None:
-        soil_moisture_sensor = next((s for s in self.sensors if s.id == 'soil_moisture'), None)
+        soil_moisture_sensor = self.sensor_index.get('soil_moisture')
         if soil_moisture_sensor and soil_moisture_sensor.value < 30:
             self.irrigation_schedule['field_1'] = True
             alert = SystemAlert(
@@ -175,36 +180,45 @@ class SmartAgricultureSystem:
                 resolved=False
             )
             self.alerts.append(alert)
+            if self._next_expiry is None:
+                self._next_expiry = alert.timestamp
             print(f"🚿 AUTO-IRRIGATION: Activated due to low soil moisture ({soil_moisture_sensor.value}%)")
 
     def update_system(self) -> None:
         print("\n" + "="*60)
         print("📊 SYSTEM UPDATE CYCLE")
         print("="*60)
-        current_readings = []
+        now = datetime.now()
+        self._values = self.generate_sensor_readings()
+        current_readings = self._values.tolist()
+        for sensor, value in zip(self.sensors, current_readings):
+            sensor.value = value
+            sensor.last_updated = now
+        self.update_sensor_statuses()
         for sensor in self.sensors:
-            sensor.value = self.generate_sensor_reading(sensor)
-            sensor.last_updated = datetime.now()
-            self.update_sensor_status(sensor)
-            current_readings.append(sensor.value)
             status_emoji = "✅" if sensor.status == "optimal" else "⚠️" if sensor.status == "warning" else "🚨"
             print(f"{status_emoji} {sensor.name}: {sensor.value}{sensor.unit} ({sensor.status})")
         
         self.learn_from_data(current_readings)
         print("\n🌱 CROP YIELD PREDICTIONS:")
-        if 'historical_data' not in st.session_state:
-            st.session_state.historical_data = []
-        for crop in self.crops:
-            crop.predicted_yield = self.predict_crop_yield(crop)
-            days_to_harvest = (crop.expected_harvest - datetime.now()).days
+        if 'hist_yield' not in st.session_state:
+            # Columnar ring buffer of (plot label, predicted yield) samples
+            st.session_state.hist_plot = [''] * YIELD_HISTORY_SIZE
+            st.session_state.hist_yield = np.zeros(YIELD_HISTORY_SIZE)
+            st.session_state.hist_count = 0
+        predicted_yields = self.predict_crop_yields()
+        for crop, predicted_yield in zip(self.crops, predicted_yields):
+            crop.predicted_yield = predicted_yield
+            days_to_harvest = (crop.expected_harvest - now).days
             print(f"   {crop.crop_type}: {crop.predicted_yield}kg/ha (harvest in {days_to_harvest} days)")
-            st.session_state.historical_data.append({
-                'plot': f"{crop.crop_type} ({crop.growth_stage})",
-                'yield': crop.predicted_yield
-            })
+            slot = st.session_state.hist_count % YIELD_HISTORY_SIZE
+            st.session_state.hist_plot[slot] = f"{crop.crop_type} ({crop.growth_stage})"
+            st.session_state.hist_yield[slot] = crop.predicted_yield
+            st.session_state.hist_count += 1
         
         self.check_for_alerts()
         self.auto_irrigate()
+        self.compact_alerts(now)
         self.display_system_status()
 
     def display_system_status(self) -> None:
@@ -231,16 +245,44 @@ class SmartAgricultureSystem:
         warning_sensors = sum(1 for s in self.sensors if s.status == 'warning')
         return 'Critical' if critical_sensors > 0 else 'Warning' if warning_sensors > 0 else 'Optimal'
 
+    def add_alert(self, key: Tuple[str, str], alert: SystemAlert) -> None:
+        self.alerts.append(alert)
+        self._unresolved_by_key[key] = alert
+        self._alert_keys[alert.id] = key
+
+    def compact_alerts(self, now: datetime) -> None:
+        cutoff = now - ALERT_RETENTION
+        if self._next_expiry is None or self._next_expiry >= cutoff:
+            return
+        # Unresolved keyed alerts stay until resolved; everything else ages out
+        self.alerts = [alert for alert in self.alerts
+                       if alert.id in self._alert_keys or alert.timestamp >= cutoff]
+        self._next_expiry = min((alert.timestamp for alert in self.alerts if alert.id not in self._alert_keys),
+                                default=None)
+
+    def snapshot(self, now: Optional[datetime] = None) -> SystemSnapshot:
+        return SystemSnapshot(
+            timestamp=now or datetime.now(),
+            sensor_data=tuple(self.sensors),
+            crop_data=tuple(self.crops),
+            alerts=tuple(alert for alert in self.alerts if not alert.resolved),
+            irrigation_status=self.irrigation_schedule.get('field_1', False),
+            system_status=self.get_system_status()
+        )
+
     def resolve_alert(self, alert_id: str) -> bool:
-        for alert in self.alerts:
-            if alert.id == alert_id:
-                alert.resolved = True
-                print(f"✅ Alert resolved: {alert.message}")
-                return True
-        return False
+        key = self._alert_keys.pop(alert_id, None)
+        if key is None:
+            return False
+        alert = self._unresolved_by_key.pop(key)
+        alert.resolved = True
+        if self._next_expiry is None or alert.timestamp < self._next_expiry:
+            self._next_expiry = alert.timestamp
+        print(f"✅ Alert resolved: {alert.message}")
+        return True
 
     def get_historical_data(self) -> List[List[float]]:
-        return self.learning_data.copy()
+        return list(self.learning_data)
 
     def generate_report(self) -> Dict:
         return {
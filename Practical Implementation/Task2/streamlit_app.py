@@ -2,8 +2,56 @@ import streamlit as st
 from smart_agriculture_system import SmartAgricultureSystem
 from ai_models import CropYieldPredictor
 from datetime import datetime, timedelta
+from collections import deque
+from itertools import chain, islice
+import numpy as np
+import html
+import os
+import shutil
+import tempfile
 import time
-import random
+
+HISTORY_MAXLEN = 720  # Snapshots kept (12 hours at the default 60 s cadence)
+ALERT_HISTORY_MAXLEN = 200
+TICK_TOLERANCE = 0.5  # Seconds early an auto-update may fire
+# Crop types shown on the dashboard; placeholders fill in the ones the system doesn't track
+CROP_TYPES = (
+    "Wheat", "Soybean", "Maize", "Rice", "Barley",
+    "Tomato", "Potato", "Cotton", "Sorghum", "Sugarcane"
+)
+GROWTH_STAGES = ("Seedling", "Vegetative", "Flowering", "Maturation", "Harvest")
+_rng = np.random.default_rng()
+DASHBOARD_CSS = """
+<style>
+    .card { padding: 15px; border-radius: 10px; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); margin-bottom: 20px; }
+    .critical { background-color: #ffcccc; padding: 10px; border-radius: 5px; }
+    .warning { background-color: #fff3cd; padding: 10px; border-radius: 5px; }
+    .optimal { background-color: #d4edda; padding: 10px; border-radius: 5px; }
+    .info { background-color: #d1ecf1; padding: 10px; border-radius: 5px; }
+    .history-item { border-left: 3px solid #6c757d; padding-left: 10px; margin: 5px 0; }
+    .status-list > div { margin-bottom: 8px; }
+</style>
+"""
+
+def new_sensor_series(sensors):
+    """Ring buffers of samples shared by all sensors: one timestamp per update, one column per sensor."""
+    return {
+        't': np.empty(HISTORY_MAXLEN, dtype='datetime64[s]'),
+        'v': np.empty((HISTORY_MAXLEN, len(sensors))),
+        's': np.empty((HISTORY_MAXLEN, len(sensors)), dtype='U8'),
+        'n': 0
+    }
+
+def record_sensor_series(timestamp, sensor_data):
+    """Append one update; sensor_data is in agri_system.sensors order, matching sensor_index."""
+    series = st.session_state.sensor_series
+    slot = series['n'] % HISTORY_MAXLEN
+    series['t'][slot] = timestamp
+    series['v'][slot] = [sensor.value for sensor in sensor_data]
+    series['s'][slot] = [sensor.status for sensor in sensor_data]
+    series['n'] += 1
+
+st.set_page_config(page_title="Smart Agriculture Dashboard", page_icon="🌱", layout="wide")
 
 @st.cache_resource
 def init_agriculture_system():
@@ -11,85 +59,51 @@ def init_agriculture_system():
     system.predictor = CropYieldPredictor()
     return system
 
-# Initialize session state and clean historical_data
+# Initialize session state; historical_data holds one SystemSnapshot per update cycle
 if 'agri_system' not in st.session_state:
     st.session_state.agri_system = init_agriculture_system()
-    st.session_state.last_update = datetime.now()
+    now = datetime.now()
+    st.session_state.last_update = now
     st.session_state.cycle_count = 0
-    st.session_state.historical_data = []
-    st.session_state.historical_alerts = []
+    st.session_state.last_tick = time.monotonic()  # Monotonic time of the last update
+    st.session_state.historical_data = deque(maxlen=HISTORY_MAXLEN)
+    st.session_state.historical_alerts = deque(maxlen=ALERT_HISTORY_MAXLEN)
+    st.session_state.historical_alert_keys = set()  # (timestamp, message) of historical_alerts
+    st.session_state.sensor_index = {sensor.name: i for i, sensor in enumerate(st.session_state.agri_system.sensors)}
+    st.session_state.sensor_series = new_sensor_series(st.session_state.agri_system.sensors)
     try:
         st.session_state.agri_system.update_system()
-        sensor_data = st.session_state.agri_system.get_sensor_data()
-        crop_data = st.session_state.agri_system.get_crop_data()
-        alerts = st.session_state.agri_system.get_alerts()
-        irrigation_status = st.session_state.agri_system.irrigation_schedule.get('field_1', False)
-        if not isinstance(sensor_data, (list, tuple)):
-            st.error(f"Initialization error: Invalid sensor_data: {sensor_data}")
-        elif not isinstance(crop_data, (list, tuple)):
-            st.error(f"Initialization error: Invalid crop_data: {crop_data}")
-        elif not isinstance(alerts, (list, tuple)):
-            st.error(f"Initialization error: Invalid alerts: {alerts}")
-        else:
-            current_state = {
-                'timestamp': datetime.now(),
-                'sensor_data': sensor_data,
-                'crop_data': crop_data,
-                'alerts': alerts,
-                'irrigation_status': irrigation_status
-            }
-            st.session_state.historical_data.append(current_state)
+        snapshot = st.session_state.agri_system.snapshot(now)
+        st.session_state.historical_data.append(snapshot)
+        record_sensor_series(snapshot.timestamp, snapshot.sensor_data)
     except Exception as e:
         st.error(f"Initialization error: {e}")
-else:
-    # Clean historical_data on startup
-    valid_keys = {'timestamp', 'sensor_data', 'crop_data', 'alerts', 'irrigation_status'}
-    st.session_state.historical_data = [
-        entry for entry in st.session_state.historical_data
-        if isinstance(entry, dict) and all(key in entry for key in valid_keys)
-    ]
 
-st.set_page_config(page_title="Smart Agriculture Dashboard", page_icon="🌱", layout="wide")
+st.markdown(DASHBOARD_CSS, unsafe_allow_html=True)
 
-st.markdown("""
-<style>
-    .card { padding: 15px; border-radius: 10px; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); margin-bottom: 20px; }
-    .critical { background-color: #ffcccc; padding: 10px; border-radius: 5px; }
-    .warning { background-color: #fff3cd; padding: 10px; border-radius: 5px; }
-    .optimal { background-color: #d4edda; padding: 10px; border-radius: 5px; }
-    .history-item { border-left: 3px solid #6c757d; padding-left: 10px; margin: 5px 0; }
-</style>
-""", unsafe_allow_html=True)
-
-def update_system():
-    sensor_data = st.session_state.agri_system.get_sensor_data()
-    crop_data = st.session_state.agri_system.get_crop_data()
-    alerts = st.session_state.agri_system.get_alerts()
-    irrigation_status = st.session_state.agri_system.irrigation_schedule.get('field_1', False)
-    
-    # Validate data
-    if not isinstance(sensor_data, (list, tuple)):
-        st.error(f"Invalid sensor_data from get_sensor_data(): {sensor_data}")
+def update_system(force=False):
+    """Poll the system and record a snapshot; unforced calls only act once per update interval."""
+    tick = time.monotonic()
+    # Fragments wake on the browser's timer, so allow them to arrive slightly early
+    if not force and not (auto_update and tick - st.session_state.last_tick >= update_freq - TICK_TOLERANCE):
         return
-    if not isinstance(crop_data, (list, tuple)):
-        st.error(f"Invalid crop_data from get_crop_data(): {crop_data}")
-        return
-    if not isinstance(alerts, (list, tuple)):
-        st.error(f"Invalid alerts from get_alerts(): {alerts}")
-        return
-    
-    current_state = {
-        'timestamp': datetime.now(),
-        'sensor_data': sensor_data,
-        'crop_data': crop_data,
-        'alerts': alerts,
-        'irrigation_status': irrigation_status
-    }
-    st.session_state.historical_data.append(current_state)
-    for alert in current_state['alerts']:
-        if alert not in st.session_state.historical_alerts:
-            st.session_state.historical_alerts.append(alert)
-    st.session_state.last_update = datetime.now()
+    st.session_state.last_tick = tick
+    st.session_state.agri_system.update_system()
+    now = datetime.now()
+    snapshot = st.session_state.agri_system.snapshot(now)
+    st.session_state.historical_data.append(snapshot)
+    record_sensor_series(now, snapshot.sensor_data)
+    historical_alerts = st.session_state.historical_alerts
+    alert_keys = st.session_state.historical_alert_keys
+    for alert in snapshot.alerts:
+        key = (alert.timestamp, alert.message)
+        if key not in alert_keys:
+            if len(historical_alerts) == historical_alerts.maxlen:
+                evicted = historical_alerts[0]
+                alert_keys.discard((evicted.timestamp, evicted.message))
+            alert_keys.add(key)
+            historical_alerts.append(alert)
+    st.session_state.last_update = now
     st.session_state.cycle_count += 1
 
 with st.sidebar:
@@ -99,26 +113,36 @@ with st.sidebar:
     st.subheader("Train AI Model")
     uploaded_file = st.file_uploader("Upload dataset (CSV)", type=["csv"])
     if uploaded_file and st.button("Train Model"):
-        import os
-        temp_path = "temp_dataset.csv"
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getvalue())
-        st.session_state.agri_system.predictor.train_model(temp_path)
+        uploaded_file.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as tmp:
+            shutil.copyfileobj(uploaded_file, tmp, 1 << 20)
+            temp_path = tmp.name
+        try:
+            st.session_state.agri_system.predictor.train_model(temp_path)
+        finally:
+            os.unlink(temp_path)
         st.success("Model trained successfully!")
-        os.remove(temp_path)
     if st.button("Manual Update"):
-        st.session_state.agri_system.update_system()
-        update_system()
+        update_system(force=True)
         st.rerun()
     if st.button("Clear Historical Data"):
-        st.session_state.historical_data = []
-        st.session_state.agri_system.update_system()
-        update_system()
+        st.session_state.historical_data = deque(maxlen=HISTORY_MAXLEN)
+        st.session_state.sensor_series = new_sensor_series(st.session_state.agri_system.sensors)
+        update_system(force=True)
         st.success("Historical data cleared and reinitialized!")
         st.rerun()
 
+# Live sections refresh as fragments on this schedule instead of rerunning the whole page
+run_every = update_freq if auto_update else None
+
 st.title("🌱 Smart Agriculture Dashboard")
-st.caption(f"Last updated: {st.session_state.last_update.strftime('%Y-%m-%d %H:%M:%S')}")
+
+@st.fragment(run_every=run_every)
+def last_updated_caption():
+    update_system()
+    st.caption(f"Last updated: {st.session_state.last_update.strftime('%Y-%m-%d %H:%M:%S')}")
+
+last_updated_caption()
 
 # Placeholder crop class for fallback
 class Crop:
@@ -130,69 +154,90 @@ class Crop:
         self.planted_date = planted_date
         self.expected_harvest = expected_harvest
 
+def placeholder_crops(existing_types, count, now):
+    """Sample crops of types not already present, built once per (types, count) and reused."""
+    cache = st.session_state.setdefault('placeholder_cache', {})
+    key = (frozenset(existing_types), count)
+    if key not in cache:
+        missing_types = [crop_type for crop_type in CROP_TYPES if crop_type not in existing_types][:count]
+        n = len(missing_types)
+        stages = _rng.choice(GROWTH_STAGES, n).tolist()
+        yields = _rng.uniform(2000, 5000, n).round(1).tolist()
+        healths = _rng.uniform(60, 95, n).round(1).tolist()
+        planted_offsets, harvest_offsets = _rng.integers(30, 121, (2, n)).tolist()
+        cache[key] = [
+            Crop(
+                crop_type=crop_type,
+                growth_stage=stage,
+                predicted_yield=predicted_yield,
+                health_score=health_score,
+                planted_date=now - timedelta(days=planted_days),
+                expected_harvest=now + timedelta(days=harvest_days)
+            ) for crop_type, stage, predicted_yield, health_score, planted_days, harvest_days
+            in zip(missing_types, stages, yields, healths, planted_offsets, harvest_offsets)
+        ]
+    return cache[key]
+
+def crop_grid(crops, now):
+    """Compact cards for every crop, with one detail panel for the selected crop."""
+    for row in range(0, len(crops), 5):
+        for col, crop in zip(st.columns(5), crops[row:row + 5]):
+            with col:
+                st.markdown(f"**{crop.crop_type}**  \n{crop.growth_stage}  \n{crop.predicted_yield} kg/ha")
+                st.progress(crop.health_score/100)
+    selected = st.selectbox("Crop details", range(len(crops)), format_func=lambda i: crops[i].crop_type)
+    crop = crops[selected]
+    days_to_harvest = (crop.expected_harvest - now).days
+    st.metric("Predicted Yield", f"{crop.predicted_yield} kg/ha")
+    st.progress(crop.health_score/100, f"Health Score: {crop.health_score}%")
+    st.write(f"**Planted:** {crop.planted_date.strftime('%Y-%m-%d')}")
+    st.write(f"**Expected Harvest:** {crop.expected_harvest.strftime('%Y-%m-%d')} (in {days_to_harvest} days)")
+
 st.header("Current Status")
 col1, col2 = st.columns([2, 1])
 
 with col1:
     st.subheader("🌿 Current Crop Status")
+    now = datetime.now()
     if st.session_state.historical_data:
-        current_crops = st.session_state.historical_data[-1]['crop_data']
+        current_crops = st.session_state.historical_data[-1].crop_data
         # Ensure 10 crops are displayed
-        crop_types = [
-            "Wheat", "Soybean", "Maize", "Rice", "Barley",
-            "Tomato", "Potato", "Cotton", "Sorghum", "Sugarcane"
-        ]
-        growth_stages = ["Seedling", "Vegetative", "Flowering", "Maturation", "Harvest"]
+        additional_crops = []
         if len(current_crops) < 10:
             # Supplement with placeholder crops
             existing_types = {crop.crop_type for crop in current_crops}
-            additional_crops = []
-            for crop_type in crop_types:
-                if crop_type not in existing_types and len(current_crops) + len(additional_crops) < 10:
-                    additional_crops.append(Crop(
-                        crop_type=crop_type,
-                        growth_stage=random.choice(growth_stages),
-                        predicted_yield=round(random.uniform(2000, 5000), 1),
-                        health_score=round(random.uniform(60, 95), 1),
-                        planted_date=datetime.now() - timedelta(days=random.randint(30, 120)),
-                        expected_harvest=datetime.now() + timedelta(days=random.randint(30, 120))
-                    ))
-            display_crops = list(current_crops) + additional_crops
-        else:
-            display_crops = current_crops[:10]  # Limit to 10 if more are returned
-        
-        for crop in display_crops[:10]:  # Ensure exactly 10 crops
-            with st.expander(f"{crop.crop_type} - {crop.growth_stage}"):
-                days_to_harvest = (crop.expected_harvest - datetime.now()).days
-                st.metric("Predicted Yield", f"{crop.predicted_yield} kg/ha")
-                st.progress(crop.health_score/100, f"Health Score: {crop.health_score}%")
-                st.write(f"**Planted:** {crop.planted_date.strftime('%Y-%m-%d')}")
-                st.write(f"**Expected Harvest:** {crop.expected_harvest.strftime('%Y-%m-%d')} (in {days_to_harvest} days)")
+            additional_crops = placeholder_crops(existing_types, 10 - len(current_crops), now)
+        crop_grid(list(islice(chain(current_crops, additional_crops), 10)), now)  # Ensure exactly 10 crops
     else:
         # Fallback if no crop data exists
         st.warning("No crop data available. Displaying sample crops.")
-        display_crops = [
-            Crop(
-                crop_type=crop_type,
-                growth_stage=random.choice(growth_stages),
-                predicted_yield=round(random.uniform(2000, 5000), 1),
-                health_score=round(random.uniform(60, 95), 1),
-                planted_date=datetime.now() - timedelta(days=random.randint(30, 120)),
-                expected_harvest=datetime.now() + timedelta(days=random.randint(30, 120))
-            ) for crop_type in crop_types
-        ]
-        for crop in display_crops:
-            with st.expander(f"{crop.crop_type} - {crop.growth_stage}"):
-                days_to_harvest = (crop.expected_harvest - datetime.now()).days
-                st.metric("Predicted Yield", f"{crop.predicted_yield} kg/ha")
-                st.progress(crop.health_score/100, f"Health Score: {crop.health_score}%")
-                st.write(f"**Planted:** {crop.planted_date.strftime('%Y-%m-%d')}")
-                st.write(f"**Expected Harvest:** {crop.expected_harvest.strftime('%Y-%m-%d')} (in {days_to_harvest} days)")
-        
-with col2:
+        crop_grid(placeholder_crops(set(), len(CROP_TYPES), now), now)
+
+SENSOR_STATUS_EMOJI = {'critical': "🚨", 'warning': "⚠️", 'optimal': "✅"}
+ALERT_CSS_CLASS = {'error': 'critical', 'warning': 'warning'}
+
+def sensor_status_html(sensors):
+    rows = "".join(
+        f'<div class="{sensor.status}">{SENSOR_STATUS_EMOJI.get(sensor.status, "✅")} '
+        f'{html.escape(sensor.name)}: {sensor.value}{html.escape(sensor.unit)}</div>'
+        for sensor in sensors
+    )
+    return f'<div class="status-list">{rows}</div>'
+
+def active_alerts_html(alerts):
+    rows = "".join(
+        f'<div class="{ALERT_CSS_CLASS.get(alert.type, "info")}">'
+        f'{alert.timestamp.strftime("%H:%M:%S")} - {html.escape(alert.message)}</div>'
+        for alert in alerts
+    )
+    return f'<div class="status-list">{rows}</div>'
+
+@st.fragment(run_every=run_every)
+def sensor_status_section():
+    update_system()
     st.subheader("📊 Current System Status")
     if st.session_state.historical_data:
-        current_status = st.session_state.agri_system.get_system_status()
+        current_status = st.session_state.historical_data[-1].system_status
         if current_status == 'Critical':
             st.error("🚨 CRITICAL SYSTEM STATUS")
         elif current_status == 'Warning':
@@ -200,54 +245,39 @@ with col2:
         else:
             st.success("✅ OPTIMAL SYSTEM STATUS")
         st.subheader("📱 Current Sensor Status")
-        for sensor in st.session_state.historical_data[-1]['sensor_data']:
-            if sensor.status == 'critical':
-                st.error(f"🚨 {sensor.name}: {sensor.value}{sensor.unit}")
-            elif sensor.status == 'warning':
-                st.warning(f"⚠️ {sensor.name}: {sensor.value}{sensor.unit}")
-            else:
-                st.success(f"✅ {sensor.name}: {sensor.value}{sensor.unit}")
+        sensors = st.session_state.historical_data[-1].sensor_data
+        st.markdown(sensor_status_html(sensors), unsafe_allow_html=True)
     else:
         st.info("No sensor data available yet.")
 
+with col2:
+    sensor_status_section()
+
 st.header("📜 Historical Data")
-history_tab1, history_tab2 = st.tabs(["Sensor History", "Alert History"])
+# Only the selected view is built; st.tabs would run both bodies on every rerun
+history_view = st.radio("History", ["Sensor History", "Alert History"],
+                        horizontal=True, label_visibility="collapsed")
 
-with history_tab1:
+@st.fragment(run_every=run_every)
+def sensor_history_section():
+    update_system()
     st.subheader("Sensor Value History")
     if st.session_state.historical_data:
-        selected_sensor = st.selectbox(
-            "Select sensor",
-            options=[sensor.name for sensor in st.session_state.agri_system.sensors]
-        )
-        sensor_history = []
-        for entry in st.session_state.historical_data:
-            if not isinstance(entry, dict):
-                continue  # Silently skip invalid entries
-            if 'sensor_data' not in entry or 'timestamp' not in entry:
-                continue  # Silently skip entries missing required keys
-            sensor_data = entry.get('sensor_data', [])
-            if not isinstance(sensor_data, (list, tuple)):
-                continue
-            for sensor in sensor_data:
-                try:
-                    if sensor.name == selected_sensor:
-                        sensor_history.append({
-                            'timestamp': entry['timestamp'],
-                            'value': sensor.value,
-                            'status': sensor.status
-                        })
-                except AttributeError:
-                    continue
-        if sensor_history:
+        selected_sensor = st.selectbox("Select sensor", options=tuple(st.session_state.sensor_index))
+        idx = st.session_state.sensor_index[selected_sensor]
+        series = st.session_state.sensor_series
+        n = series['n']
+        if n:
             st.write(f"### {selected_sensor} History")
-            for entry in sensor_history[-10:]:
-                status_emoji = "🚨" if entry['status'] == "critical" else "⚠️" if entry['status'] == "warning" else "✅"
+            slots = np.arange(max(0, n - 10), n) % HISTORY_MAXLEN
+            recent = zip(series['t'][slots].tolist(), series['v'][slots, idx].tolist(), series['s'][slots, idx].tolist())
+            for timestamp, value, status in recent:
+                status_emoji = "🚨" if status == "critical" else "⚠️" if status == "warning" else "✅"
                 st.markdown(
                     f"""
                     <div class="history-item">
-                        {status_emoji} {entry['timestamp'].strftime('%H:%M:%S')}: 
-                        {entry['value']} ({entry['status'].title()})
+                        {status_emoji} {timestamp.strftime('%H:%M:%S')}: 
+                        {value} ({status.title()})
                     </div>
                     """,
                     unsafe_allow_html=True
@@ -257,10 +287,14 @@ with history_tab1:
     else:
         st.info("No sensor history available yet.")
 
-with history_tab2:
+@st.fragment(run_every=run_every)
+def alert_history_section():
+    update_system()
     st.subheader("Alert History")
     if st.session_state.historical_alerts:
-        for alert in st.session_state.historical_alerts[-10:]:
+        recent_alerts = islice(st.session_state.historical_alerts,
+                               max(0, len(st.session_state.historical_alerts) - 10), None)
+        for alert in recent_alerts:
             if alert.type == "error":
                 st.error(f"🚨 {alert.timestamp.strftime('%H:%M:%S')} - {alert.message}")
             elif alert.type == "warning":
@@ -270,37 +304,42 @@ with history_tab2:
     else:
         st.info("No alerts available yet.")
 
-st.header("🚨 Active Alerts")
-if st.session_state.historical_data and st.session_state.historical_data[-1]['alerts']:
-    current_alerts = st.session_state.historical_data[-1]['alerts']
-    for alert in current_alerts:
-        if alert.type == "error":
-            st.error(f"{alert.timestamp.strftime('%H:%M:%S')} - {alert.message}")
-        elif alert.type == "warning":
-            st.warning(f"{alert.timestamp.strftime('%H:%M:%S')} - {alert.message}")
-        else:
-            st.info(f"{alert.timestamp.strftime('%H:%M:%S')} - {alert.message}")
+if history_view == "Sensor History":
+    sensor_history_section()
 else:
-    st.info("No active alerts")
+    alert_history_section()
+
+st.header("🚨 Active Alerts")
+
+@st.fragment(run_every=run_every)
+def active_alerts_section():
+    update_system()
+    if st.session_state.historical_data and st.session_state.historical_data[-1].alerts:
+        current_alerts = st.session_state.historical_data[-1].alerts
+        st.markdown(active_alerts_html(current_alerts), unsafe_allow_html=True)
+    else:
+        st.info("No active alerts")
+
+active_alerts_section()
 
 st.header("💧 Irrigation System")
-if st.session_state.historical_data:
-    irrigation_status = st.session_state.historical_data[-1]['irrigation_status']
-    if irrigation_status:
-        st.warning("🚿 Irrigation is currently ACTIVE")
+
+@st.fragment(run_every=run_every)
+def irrigation_section():
+    update_system()
+    if st.session_state.historical_data:
+        irrigation_status = st.session_state.historical_data[-1].irrigation_status
+        if irrigation_status:
+            st.warning("🚿 Irrigation is currently ACTIVE")
+        else:
+            st.info("Irrigation is currently INACTIVE")
     else:
-        st.info("Irrigation is currently INACTIVE")
-else:
-    st.info("No irrigation data available yet.")
+        st.info("No irrigation data available yet.")
+
+irrigation_section()
 
 st.header("🤖 AI Predictions")
 st.subheader("🌾 Crop Yield Prediction Model")
 st.write(f"Model Accuracy: {st.session_state.agri_system.predictor.model_accuracy:.2%}")
 st.write("Feature Weights:")
-st.json(st.session_state.agri_system.predictor.model_weights)
-
-if auto_update:
-    time.sleep(update_freq)
-    st.session_state.agri_system.update_system()
-    update_system()
-    st.rerun()
\ No newline at end of file
+st.code(st.session_state.agri_system.predictor.weights_json, language='json')
\ No newline at end of file